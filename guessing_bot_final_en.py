@@ -1,22 +1,53 @@
 import os
+import asyncio
+import logging
+import aiohttp
+from aiohttp import web # Minimal keep-alive HTTP server on the bot's event loop
 import discord
 from discord.ext import commands, tasks
-import json
+import sqlite3
+import bisect
+import orjson # Fast JSON (de)serialization for the persistence files
 from datetime import datetime, timedelta
 import threading
 import sys
-from flask import Flask # Import Flask for the keep-alive server
-
-# --- FLASK (WEB SERVICE / KEEP-ALIVE) SETUP ---
-# Initializes the Flask app
-app = Flask(__name__)
+import atexit
+import signal
+
+# --- LOGGING SETUP ---
+# Configured once on the root logger so discord.py's own loggers share the same handler
+# LOG_LEVEL=DEBUG shows per-save diagnostics; they cost nothing when the level is higher
+LOG_LEVEL_NAME = os.getenv('LOG_LEVEL', 'INFO').upper()
+# An unknown name (e.g. a typo) falls back to INFO instead of failing at import;
+# getLevelName() returns the int level for a known name and a string otherwise (works on all Python 3 versions)
+LOG_LEVEL = logging.getLevelName(LOG_LEVEL_NAME)
+logging.basicConfig(
+	level=LOG_LEVEL if isinstance(LOG_LEVEL, int) else logging.INFO,
+	format='%(asctime)s %(levelname)s %(name)s: %(message)s',
+	handlers=[logging.StreamHandler()]
+)
+log = logging.getLogger('guessbot')
+if not isinstance(LOG_LEVEL, int):
+	log.warning("Unknown LOG_LEVEL %r, using INFO.", LOG_LEVEL_NAME)
+
+# --- WEB SERVICE / KEEP-ALIVE SETUP ---
+# Served by aiohttp on the same event loop as the bot: no extra thread, no Flask/Werkzeug
 # Get the port from environment variables (Render sets this)
-WEB_PORT = os.getenv('PORT', 8080) 
+WEB_PORT = int(os.getenv('PORT', 8080))
 
-@app.route('/')
-def home():
+async def home(request):
 	"""Simple Health Check endpoint required by Render for Web Services."""
-	return "Item Guessing Bot Worker is Running! (Keep-Alive Active)", 200
+	return web.Response(text="Item Guessing Bot Worker is Running! (Keep-Alive Active)")
+
+health_app = web.Application()
+health_app.router.add_get('/', home)
+
+async def start_health_server():
+	"""Starts the keep-alive server and returns its runner for cleanup."""
+	runner = web.AppRunner(health_app, access_log=None)
+	await runner.setup()
+	await web.TCPSite(runner, '0.0.0.0', WEB_PORT).start()
+	return runner
 
 # --- BOT CONFIGURATION AND CONSTANTS ---
 # TOKEN is read via os.getenv('DISCORD_TOKEN') below
@@ -24,7 +55,8 @@ def home():
 # Centralized Configuration Dictionary - IDs updated with user-provided labels
 CONFIG = {
 	# File Persistence
-	'DATA_FILE': 'user_wins.json',
+	'DATA_FILE': 'user_wins.json', # Legacy wins file, imported into WINS_DB_FILE on first start
+	'WINS_DB_FILE': 'wins.db',
 	'GAME_STATE_FILE': 'game_state.json', # NEW: File for game state persistence
 	
 	# Game Parameters
@@ -63,50 +95,100 @@ CONFIG = {
 	}
 }
 
+# Constants read on hot paths (commands, hint reveals), bound once instead of per-call dict lookups
+REQUIRED_HINTS = CONFIG['REQUIRED_HINTS']
+HINT_CHANNEL_ID = CONFIG['HINT_CHANNEL_ID']
+WINS_CHANNEL_ID = CONFIG['WINS_CHANNEL_ID']
+TARGET_CATEGORY_ID = CONFIG['TARGET_CATEGORY_ID']
+WINNER_ANNOUNCEMENT_CHANNEL_ID = CONFIG['WINNER_ANNOUNCEMENT_CHANNEL_ID']
+COOLDOWN_MINUTES = CONFIG['GUESS_COOLDOWN_MINUTES']
+# Guess cooldown in seconds (enforced by the @commands.cooldown bucket on !guess)
+COOLDOWN_SECONDS = COOLDOWN_MINUTES * 60
+
+# Values derived from CONFIG once at import time (CONFIG is not modified at runtime)
+HINT_PING_STRING = "".join(f"<@&{role_id}> " for role_id in CONFIG['HINT_PING_ROLE_IDS'])
+GAME_END_PING_STRING = f"<@&{CONFIG['GAME_END_PING_ROLE_ID']}>"
+ADMIN_ROLE_IDS = frozenset(CONFIG['ADMIN_ROLE_IDS'])
+WINNER_ROLE_IDS = frozenset(CONFIG['WINNER_ROLES_CONFIG'].values())
+# Ascending win thresholds and their role IDs (parallel lists) for bisect-based tier lookup
+WIN_TIER_LEVELS = sorted(CONFIG['WINNER_ROLES_CONFIG'])
+WIN_TIER_ROLE_IDS = [CONFIG['WINNER_ROLES_CONFIG'][level] for level in WIN_TIER_LEVELS]
+
 # --- Game State Variables ---
 correct_answer = None
+# Case-folded copy of correct_answer, computed once when the answer changes
+correct_answer_lower = None
 current_hints_storage = {}
-current_hints_revealed = []
+# Revealed hints are always the prefix 1..N of current_hints_storage, so only N is tracked
+current_hints_revealed_count = 0
 is_game_active = False
 # Initialize using the updated CONFIG value (60 minutes)
 hint_timing_minutes = CONFIG['DEFAULT_HINT_TIMING_MINUTES'] 
 last_hint_reveal_time = None
+# asyncio.Task sleeping until the next hint reveal (None when nothing is scheduled)
+hint_task = None
+# Channel objects resolved once per connection by resolve_channels() (None until found)
+hint_channel = None
+winner_channel = None
 user_wins = {}
-# Dictionary to track last guess time for cooldown
-last_guess_time = {} 
+# Lazily re-queried top-N leaderboard [(user_id, wins), ...]; None means it must be rebuilt
+LEADERBOARD_SIZE = 10
+leaderboard_top_cache = None
+# Rendered !wins embed, reused until the next win (names don't need re-resolving in between)
+leaderboard_embed_cache = None
+# Set by save_game_state(); the state_flusher task persists the state when True
+game_state_dirty = False
+# Set once the first on_ready has loaded the persisted wins and game state
+state_loaded = False
 
 # Set up Intents
 intents = discord.Intents.default()
 intents.message_content = True
 intents.members = True # Required for reliable role management and leaderboard
-bot = commands.Bot(command_prefix='!', intents=intents)
+# Role and user pings are intended (hint/game-end roles, winner mention); @everyone/@here in admin-entered text is not
+bot = commands.Bot(
+	command_prefix='!',
+	intents=intents,
+	allowed_mentions=discord.AllowedMentions(everyone=False, roles=True, users=True)
+)
 
 # --- Utility Functions ---
 
 def format_time_remaining(seconds):
 	"""Converts seconds into a clean H/M string (e.g., '1h 5m')."""
-	hours = seconds // 3600
-	minutes = (seconds % 3600) // 60
-	parts = []
+	hours, rem = divmod(seconds, 3600)
+	minutes = rem // 60
+	# Single return per case: no intermediate list or join
+	if hours > 0 and minutes > 0:
+		return f"{hours}h {minutes}m"
 	if hours > 0:
-		parts.append(f"{hours}h")
+		return f"{hours}h"
 	if minutes > 0:
-		parts.append(f"{minutes}m")
-	return " ".join(parts) if parts else "a moment"
-
-def generate_hint_ping_string():
-	"""Generates the ping string for all defined hint ping roles."""
-	pings = "".join([f"<@&{role_id}> " for role_id in CONFIG['HINT_PING_ROLE_IDS']])
-	# Diagnostic print to confirm the generated ping string
-	print(f"DIAG: Generated hint ping string: '{pings.strip()}'") 
-	return pings
-
-def generate_game_end_ping_string():
-	"""Generates the ping string for the single game end role."""
-	role_id = CONFIG['GAME_END_PING_ROLE_ID']
-	ping = f"<@&{role_id}>"
-	print(f"DIAG: Generated game end ping string: '{ping}'")
-	return ping
+		return f"{minutes}m"
+	return "a moment"
+
+def get_leaderboard_top():
+	"""Returns the cached top-N winners, re-querying the indexed wins table only after the wins changed."""
+	global leaderboard_top_cache
+	if leaderboard_top_cache is None:
+		if wins_db is None:
+			return []
+		with wins_db_lock:
+			leaderboard_top_cache = wins_db.execute(
+				"SELECT user_id, n FROM wins ORDER BY n DESC LIMIT ?", (LEADERBOARD_SIZE,)
+			).fetchall()
+	return leaderboard_top_cache
+
+def invalidate_leaderboard():
+	"""Marks the cached leaderboard and its rendered embed as stale after user_wins changes."""
+	global leaderboard_top_cache, leaderboard_embed_cache
+	leaderboard_top_cache = None
+	leaderboard_embed_cache = None
+
+def get_tier_role_id(wins_count):
+	"""Returns the role ID of the highest winner tier reached with wins_count, or None."""
+	idx = bisect.bisect_right(WIN_TIER_LEVELS, wins_count) - 1
+	return WIN_TIER_ROLE_IDS[idx] if idx >= 0 else None
 
 # --- Custom Admin Check ---
 
@@ -116,17 +198,14 @@ def is_authorized_admin():
 		if not ctx.guild:
 			return False 
 		
-		member_roles = [role.id for role in ctx.author.roles]
-		
-		for required_id in CONFIG['ADMIN_ROLE_IDS']:
-			if required_id in member_roles:
-				return True
-				
-		return False
+		return not ADMIN_ROLE_IDS.isdisjoint(role.id for role in ctx.author.roles)
 	return commands.check(predicate)
 
 # --- Global Command Location Check ---
 
+# Commands allowed in the leaderboard channel (frozenset for O(1) membership)
+LEADERBOARD_COMMANDS = frozenset({'wins', 'lbc', 'top', 'mywins'})
+
 @bot.check
 async def command_location_check(ctx):
 	"""Global check to restrict commands based on context."""
@@ -134,12 +213,12 @@ async def command_location_check(ctx):
 		return True # Allow DMs
 
 	# Check 1: Command is in the main game category (Most commands work here)
-	if ctx.channel.category_id == CONFIG['TARGET_CATEGORY_ID']:
+	if ctx.channel.category_id == TARGET_CATEGORY_ID:
 		return True
 
 	# Check 2: Command is in the specific leaderboard channel (!wins allowed, others blocked)
-	if ctx.channel.id == CONFIG['WINS_CHANNEL_ID']:
-		if ctx.command.name in ['wins', 'lbc', 'top', 'mywins']: # Added 'mywins' to the allowed list
+	if ctx.channel.id == WINS_CHANNEL_ID:
+		if ctx.command.name in LEADERBOARD_COMMANDS:
 			return True # !wins and !mywins are allowed
 		else:
 			# Block all other commands (!guess, !start, etc.)
@@ -154,158 +233,344 @@ async def command_location_check(ctx):
 	await ctx.send(f"❌ This command can only be used in the designated game category or wins channel.", delete_after=10)
 	return False
 
+# --- Atomic File Writes ---
+# Serializes writes from the flusher/worker threads with immediate flushes from the event loop
+file_write_lock = threading.Lock()
+
+def atomic_write_bytes(path, data):
+	"""Writes data to a temp file, fsyncs it, then swaps it into place so readers never see a partial file."""
+	tmp_path = f"{path}.tmp"
+	with file_write_lock:
+		with open(tmp_path, 'wb') as f:
+			f.write(data)
+			f.flush()
+			os.fsync(f.fileno())
+		os.replace(tmp_path, path)
+
 # --- Data Persistence Functions (User Wins) ---
-def load_user_wins():
-	global user_wins
+# Wins live in SQLite (one upserted row per win); user_wins is an in-memory mirror for fast reads
+wins_db = None
+# Serializes use of the shared connection between the event loop and worker threads
+wins_db_lock = threading.Lock()
+
+def open_wins_db():
+	"""Opens the wins database, creating the schema and importing the legacy JSON file once."""
+	# check_same_thread=False: win upserts run in a worker thread via asyncio.to_thread
+	conn = sqlite3.connect(CONFIG['WINS_DB_FILE'], isolation_level=None, check_same_thread=False)
+	conn.execute("PRAGMA journal_mode=WAL")
+	conn.execute("CREATE TABLE IF NOT EXISTS wins (user_id INTEGER PRIMARY KEY, n INTEGER NOT NULL)")
+	conn.execute("CREATE INDEX IF NOT EXISTS wins_by_n ON wins(n DESC)")
+	
 	DATA_FILE = CONFIG['DATA_FILE']
-	if os.path.exists(DATA_FILE):
+	if os.path.exists(DATA_FILE) and conn.execute("SELECT 1 FROM wins LIMIT 1").fetchone() is None:
 		try:
-			with open(DATA_FILE, 'r') as f:
-				data = json.load(f)
-				# Ensure keys are integers (Discord IDs)
-				user_wins = {int(k): v for k, v in data.items()}
-				print(f"Loaded {len(user_wins)} win records.")
-		except json.JSONDecodeError:
-			print("ERROR: user_wins.json is corrupted or empty. Starting with empty data.")
-			user_wins = {}
-	else:
+			with open(DATA_FILE, 'rb') as f:
+				data = orjson.loads(f.read())
+			# Ensure keys are integers (Discord IDs)
+			rows = [(int(k), v) for k, v in data.items()]
+		except (OSError, ValueError, orjson.JSONDecodeError) as e:
+			log.error("Could not import %s (%s). Starting with empty data.", DATA_FILE, e)
+			return conn
+		
+		# One transaction: a failed import leaves the table empty, so it is retried on the next start
+		conn.execute("BEGIN")
+		try:
+			conn.executemany("INSERT INTO wins(user_id, n) VALUES(?, ?)", rows)
+		except sqlite3.Error:
+			conn.execute("ROLLBACK")
+			raise
+		conn.execute("COMMIT")
+		log.info("Imported %d win records from %s.", len(rows), DATA_FILE)
+	return conn
+
+def load_user_wins():
+	global user_wins, wins_db
+	invalidate_leaderboard()
+	try:
+		with wins_db_lock:
+			if wins_db is None:
+				wins_db = open_wins_db()
+			user_wins = dict(wins_db.execute("SELECT user_id, n FROM wins"))
+		log.info("Loaded %d win records.", len(user_wins))
+	except sqlite3.Error as e:
+		log.error("ERROR LOADING WINS DATABASE: %s. Starting with empty data.", e)
 		user_wins = {}
 
-def save_user_wins():
-	DATA_FILE = CONFIG['DATA_FILE']
+def save_user_win(user_id):
+	"""Increments one user's win row; blocking, so async code runs it via asyncio.to_thread."""
+	if wins_db is None:
+		# The database failed to open at startup; the win is only kept in the in-memory mirror
+		log.error("ERROR SAVING DATA: wins database is not available, win for %s not persisted.", user_id)
+		return
 	try:
-		with open(DATA_FILE, 'w') as f:
-			json.dump(user_wins, f, indent=4)
-			print("Win data saved.")
-	except Exception as e:
-		print(f"ERROR SAVING DATA: {e}")
+		with wins_db_lock:
+			wins_db.execute(
+				"INSERT INTO wins(user_id, n) VALUES(?, 1) ON CONFLICT(user_id) DO UPDATE SET n = n + 1",
+				(user_id,)
+			)
+		log.debug("Win data saved.")
+	except sqlite3.Error as e:
+		log.error("ERROR SAVING DATA: %s", e)
 
 # --- Game State Persistence Functions ---
+# Snapshots are numbered on the event loop; a worker thread never writes one older than what is on disk,
+# so overlapping flushes (e.g. state_flusher and a win) can't let a stale snapshot land last
+game_state_generation = 0
+game_state_written_generation = 0
+game_state_write_lock = threading.Lock()
+
 def save_game_state():
-	"""Saves the critical game state variables to a JSON file."""
-	global correct_answer, current_hints_storage, current_hints_revealed, is_game_active, last_hint_reveal_time, hint_timing_minutes
-	
-	# Prepare the state for JSON serialization
-	state = {
+	"""Marks the game state as changed; the state_flusher task writes it to disk in batches."""
+	global game_state_dirty
+	game_state_dirty = True
+
+def build_game_state():
+	"""Snapshots the critical game state variables into a JSON-serializable dict."""
+	# Copies keep the snapshot stable while it is written from a worker thread
+	return {
 		'is_game_active': is_game_active,
 		'correct_answer': correct_answer,
-		# Convert keys of current_hints_storage (int) to strings for JSON
-		'current_hints_storage': {str(k): v for k, v in current_hints_storage.items()},
-		'current_hints_revealed': current_hints_revealed,
-		# Convert datetime object to ISO 8601 string for persistence
-		'last_hint_reveal_time': last_hint_reveal_time.isoformat() if last_hint_reveal_time else None,
+		# Integer keys are converted to strings by orjson (OPT_NON_STR_KEYS)
+		'current_hints_storage': dict(current_hints_storage),
+		'current_hints_revealed_count': current_hints_revealed_count,
+		# Epoch seconds: restored with a plain fromtimestamp() instead of parsing an ISO string
+		'last_hint_reveal_time': last_hint_reveal_time.timestamp() if last_hint_reveal_time else None,
 		'hint_timing_minutes': hint_timing_minutes
 	}
-	
-	try:
-		with open(CONFIG['GAME_STATE_FILE'], 'w') as f:
-			json.dump(state, f, indent=4)
-			print("Game state saved.")
-	except Exception as e:
-		print(f"ERROR SAVING GAME STATE: {e}")
+
+def snapshot_game_state():
+	"""Returns (generation, state) for a new snapshot; a higher generation is always newer."""
+	global game_state_generation
+	game_state_generation += 1
+	return game_state_generation, build_game_state()
+
+def write_game_state(generation, state):
+	"""Writes a game state snapshot to the JSON file, unless a newer one has already been written."""
+	global game_state_written_generation
+	with game_state_write_lock:
+		if generation <= game_state_written_generation:
+			log.debug("Skipped stale game state snapshot %d.", generation)
+			return
+		try:
+			# Compact output: the file is only read back by load_game_state, so indentation just adds bytes to fsync
+			atomic_write_bytes(CONFIG['GAME_STATE_FILE'], orjson.dumps(state, option=orjson.OPT_NON_STR_KEYS))
+			game_state_written_generation = generation
+			log.debug("Game state saved.")
+		except (OSError, orjson.JSONEncodeError) as e:
+			log.error("ERROR SAVING GAME STATE: %s", e)
+
+def flush_game_state():
+	"""Immediately saves the game state, used for terminal events and shutdown."""
+	global game_state_dirty
+	game_state_dirty = False
+	write_game_state(*snapshot_game_state())
+
+def flush_pending_game_state():
+	"""Persists any batched game state changes that haven't been flushed yet."""
+	if game_state_dirty:
+		flush_game_state()
+
+async def flush_game_state_async():
+	"""Saves the game state from async code without blocking the event loop on disk I/O."""
+	global game_state_dirty
+	# Clear the flag before writing so changes made during the write trigger another flush
+	game_state_dirty = False
+	await asyncio.to_thread(write_game_state, *snapshot_game_state())
+
+@tasks.loop(seconds=5)
+async def state_flusher():
+	"""Coalesces bursts of save_game_state() calls into a single write every few seconds."""
+	if game_state_dirty:
+		await flush_game_state_async()
 
 def load_game_state():
 	"""Loads the game state from a JSON file."""
-	global correct_answer, current_hints_storage, current_hints_revealed, is_game_active, last_hint_reveal_time, hint_timing_minutes
+	global correct_answer, correct_answer_lower, current_hints_storage, current_hints_revealed_count, is_game_active, last_hint_reveal_time, hint_timing_minutes
 	
 	STATE_FILE = CONFIG['GAME_STATE_FILE']
 	if os.path.exists(STATE_FILE):
 		try:
-			with open(STATE_FILE, 'r') as f:
-				state = json.load(f)
+			with open(STATE_FILE, 'rb') as f:
+				state = orjson.loads(f.read())
 				
 				is_game_active = state.get('is_game_active', False)
 				correct_answer = state.get('correct_answer')
+				if correct_answer:
+					# Same normalization as !setitem: older state files may hold answers with repeated spaces
+					correct_answer = " ".join(correct_answer.split())
+				correct_answer_lower = correct_answer.casefold() if correct_answer else None
 				# Convert keys of current_hints_storage (string) back to integers
 				current_hints_storage = {int(k): v for k, v in state.get('current_hints_storage', {}).items()}
-				current_hints_revealed = state.get('current_hints_revealed', [])
+				if 'current_hints_revealed_count' in state:
+					current_hints_revealed_count = state['current_hints_revealed_count']
+				else:
+					# Migrate state files written with the old list of revealed hint dicts
+					current_hints_revealed_count = len(state.get('current_hints_revealed', []))
 				hint_timing_minutes = state.get('hint_timing_minutes', CONFIG['DEFAULT_HINT_TIMING_MINUTES'])
 				
-				last_time_str = state.get('last_hint_reveal_time')
-				if last_time_str:
-					# Parse the ISO 8601 string back into a datetime object
-					last_hint_reveal_time = datetime.fromisoformat(last_time_str)
+				last_time = state.get('last_hint_reveal_time')
+				if isinstance(last_time, str):
+					# State files written before the switch to epoch seconds hold an ISO 8601 string
+					last_hint_reveal_time = datetime.fromisoformat(last_time)
+				elif last_time is not None:
+					last_hint_reveal_time = datetime.fromtimestamp(last_time)
 				else:
 					last_hint_reveal_time = None
 
-				print(f"Game state loaded. Active: {is_game_active}")
+				log.info("Game state loaded. Active: %s", is_game_active)
 				
-		except json.JSONDecodeError:
-			print("ERROR: game_state.json is corrupted or empty. Starting fresh.")
+		except orjson.JSONDecodeError:
+			log.error("game_state.json is corrupted or empty. Starting fresh.")
 			is_game_active = False
 	
 # --- END Game State Persistence Functions ---
 
 
-# --- Timed Hint Task ---
-@tasks.loop(minutes=1)
-async def hint_timer():
-	global current_hints_revealed, last_hint_reveal_time, current_hints_storage, hint_timing_minutes
+# --- Timed Hint Scheduler ---
+# Seconds to wait before retrying a reveal that failed (missing channel or Discord/OS error)
+HINT_RETRY_SECONDS = 60
+
+async def reveal_scheduled_hint(channel):
+	"""Posts the next hint in the given channel. Returns False when there is no hint left to reveal."""
+	global current_hints_revealed_count, last_hint_reveal_time
 	
-	# Check if the bot is ready and game is active
-	if not bot.is_ready() or not is_game_active or not last_hint_reveal_time or not current_hints_storage:
-		return
-		
-	now = datetime.now()
-	next_reveal_time = last_hint_reveal_time + timedelta(minutes=hint_timing_minutes)
+	next_hint_number = current_hints_revealed_count + 1
+	if next_hint_number not in current_hints_storage:
+		return False
 	
-	try:
-		if now >= next_reveal_time:
-			next_hint_number = len(current_hints_revealed) + 1
-			REQUIRED_HINTS = CONFIG['REQUIRED_HINTS']
-			
-			if next_hint_number in current_hints_storage:
-				# USE THE DEDICATED CHANNEL FOR AUTOMATIC HINTS
-				channel = bot.get_channel(CONFIG['HINT_CHANNEL_ID'])
-				
-				if channel:
-					hint_text = current_hints_storage[next_hint_number]
-					
-					# Use the new utility function for ping string
-					ping_string = generate_hint_ping_string()
-					
-					# Construct the message including the role pings
-					ping_message = (
-						f"{ping_string}📢 **New Hint ({next_hint_number}/{REQUIRED_HINTS}):** "
-						f"_{hint_text}_"
-					)
+	hint_text = current_hints_storage[next_hint_number]
+	
+	# Construct the message including the role pings
+	ping_message = (
+		f"{HINT_PING_STRING}📢 **New Hint ({next_hint_number}/{REQUIRED_HINTS}):** "
+		f"_{hint_text}_"
+	)
 
-					await channel.send(ping_message)
-					
-					# Store the revealed hint and reset the timer
-					current_hints_revealed.append({'hint_number': next_hint_number, 'text': hint_text}) 
-					last_hint_reveal_time = now
-					save_game_state() # SAVE STATE after a hint reveal
-				else:
-					print(f"Warning: Hint channel ID {CONFIG['HINT_CHANNEL_ID']} not found.")
-			
-			else:
-				# All hints revealed, stop the timer
-				if hint_timer.is_running():
-					hint_timer.stop()
-					print("Hint timer stopped: All hints revealed.")
-					
-	except Exception as e:
-		# Log the error but allow the loop to continue next minute
-		print(f"ERROR in hint_timer task: {e}")
+	await channel.send(ping_message)
+	
+	# Store the revealed hint and reset the timer
+	current_hints_revealed_count = next_hint_number
+	last_hint_reveal_time = datetime.now()
+	save_game_state() # SAVE STATE after a hint reveal
+	return True
+
+async def hint_scheduler():
+	"""Sleeps until the next hint is due and reveals it, until the game ends or all hints are out."""
+	while is_game_active and last_hint_reveal_time and current_hints_storage:
+		next_reveal_time = last_hint_reveal_time + timedelta(minutes=hint_timing_minutes)
+		delay = (next_reveal_time - datetime.now()).total_seconds()
+		if delay > 0:
+			# One wake-up per hint instead of polling every minute
+			await asyncio.sleep(delay)
+			continue
+		
+		# USE THE DEDICATED CHANNEL FOR AUTOMATIC HINTS
+		channel = hint_channel
+		if not channel:
+			log.warning("Hint channel ID %s not found.", HINT_CHANNEL_ID)
+			await asyncio.sleep(HINT_RETRY_SECONDS)
+			resolve_channels()
+			continue
+		
+		try:
+			if not await reveal_scheduled_hint(channel):
+				log.info("Hint scheduler stopped: All hints revealed.")
+				return
+		except (discord.HTTPException, OSError):
+			# Log the error and retry the same hint later
+			log.exception("ERROR in hint scheduler")
+			await asyncio.sleep(HINT_RETRY_SECONDS)
+
+def schedule_hints():
+	"""(Re)arms the hint scheduler for the active game, replacing any pending schedule."""
+	global hint_task
+	cancel_hints()
+	if is_game_active:
+		hint_task = asyncio.create_task(hint_scheduler())
+
+def cancel_hints():
+	"""Cancels the pending hint reveal, if any."""
+	global hint_task
+	if hint_task and not hint_task.done():
+		hint_task.cancel()
+	hint_task = None
+
+def resolve_channels():
+	"""Caches the hint and winner announcement channel objects instead of looking them up per use."""
+	global hint_channel, winner_channel
+	hint_channel = bot.get_channel(HINT_CHANNEL_ID)
+	winner_channel = bot.get_channel(WINNER_ANNOUNCEMENT_CHANNEL_ID)
+
+# --- Presence Updates ---
+# Seconds to wait before applying a presence change, so rapid transitions collapse into one update
+PRESENCE_DEBOUNCE_SECONDS = 1
+# Latest requested "Playing ..." text and the task that applies it (None when idle)
+presence_target = None
+presence_task = None
+
+def set_presence(name):
+	"""Requests a presence change without waiting on the gateway; only the latest request is sent."""
+	global presence_target, presence_task
+	presence_target = name
+	if presence_task is None or presence_task.done():
+		presence_task = asyncio.create_task(apply_presence())
+
+async def apply_presence():
+	"""Sends presence_target to the gateway, repeating if it changed while the update was in flight."""
+	applied = None
+	while applied != presence_target:
+		await asyncio.sleep(PRESENCE_DEBOUNCE_SECONDS)
+		applied = presence_target
+		try:
+			await bot.change_presence(activity=discord.Game(name=applied))
+		except discord.DiscordException as e: # e.g. ConnectionClosed while reconnecting
+			log.warning("Could not update presence: %s", e)
 
 # --- Bot Events ---
 @bot.event
 async def on_ready():
-	print(f'{bot.user.name} has connected to Discord!')
-	load_user_wins()
-	load_game_state() # Load game state on startup
+	global state_loaded
+	log.info("%s has connected to Discord!", bot.user.name)
+	# on_ready fires again on every non-resumed reconnect; reloading then would overwrite
+	# in-memory changes that the state_flusher hasn't written yet, so load only once
+	if not state_loaded:
+		await asyncio.to_thread(load_user_wins)
+		load_game_state() # Load game state on startup
+		state_loaded = True
+	resolve_channels()
 	
 	if is_game_active:
-		await bot.change_presence(activity=discord.Game(name=f"Guess the item! (!guess)"))
-		print(f"Resuming active game for item: {correct_answer}")
+		set_presence("Guess the item! (!guess)")
+		log.info("Resuming active game for item: %s", correct_answer)
 	else:
-		await bot.change_presence(activity=discord.Game(name=f"Setting up the game (!setitem)"))
+		set_presence("Setting up the game (!setitem)")
 		
-	# CRITICAL FIX: Ensure timer starts on ready based on the loaded state
-	if not hint_timer.is_running():
-		hint_timer.start()
-		print("Hint timer started/restarted on bot startup.")
+	if not state_flusher.is_running():
+		state_flusher.start()
+		
+	# CRITICAL FIX: Ensure hints resume on ready based on the loaded state
+	schedule_hints()
+	if is_game_active:
+		log.info("Hint scheduler started/restarted on bot startup.")
+
+
+@bot.event
+async def on_resumed():
+	# Re-resolve in case the channel cache was rebuilt during the reconnect
+	resolve_channels()
+
+
+@bot.event
+async def on_guild_available(guild):
+	# Channels of guilds that were unavailable at on_ready become resolvable here
+	resolve_channels()
+
+
+@bot.event
+async def on_disconnect():
+	# Don't lose batched state changes if the connection drops before the next flush
+	if game_state_dirty:
+		await flush_game_state_async()
 
 
 # --- Utility Functions ---
@@ -314,51 +579,53 @@ async def award_winner_roles(member: discord.Member):
 
 	user_id = member.id
 	guild = member.guild
-	WINNER_ROLES_CONFIG = CONFIG['WINNER_ROLES_CONFIG']
 	
-	# 1. Update and save win count
-	user_wins[user_id] = user_wins.get(user_id, 0) + 1
-	wins_count = user_wins[user_id]
-	save_user_wins()
+	# 1. Update and save win count (a single-row upsert, off the event loop)
+	wins_count = user_wins[user_id] = user_wins.get(user_id, 0) + 1
+	await asyncio.to_thread(save_user_win, user_id)
+	# Invalidate after the write so a concurrent !wins can't re-cache the old ranking
+	invalidate_leaderboard()
 
 	# 2. Find the highest tier role the user qualifies for
-	achieved_role_id = None
-	sorted_wins_levels = sorted(WINNER_ROLES_CONFIG.keys(), reverse=True)
-	
-	for level in sorted_wins_levels:
-		if wins_count >= level:
-			achieved_role_id = WINNER_ROLES_CONFIG[level]
-			break
+	achieved_role_id = get_tier_role_id(wins_count)
 
 	if achieved_role_id:
 		target_role = guild.get_role(achieved_role_id)
 		
 		if not target_role:
-			print(f"Role with ID {achieved_role_id} not found.")
+			log.warning("Role with ID %s not found.", achieved_role_id)
 			return
 
-		all_winner_role_ids = list(WINNER_ROLES_CONFIG.values())
-		
-		# Identify lower-tier roles to remove (only those from the WINNER_ROLES_CONFIG)
-		roles_to_remove = [
-			role for role in member.roles 
-			if role.id in all_winner_role_ids and role.id != achieved_role_id
+		# Keep every non-winner role plus the achieved tier; lower-tier winner roles are dropped
+		# (member.roles[0] is @everyone, which must not be sent in a role edit)
+		current_roles = member.roles[1:]
+		final_roles = [
+			role for role in current_roles 
+			if role.id not in WINNER_ROLE_IDS or role.id == achieved_role_id
 		]
+		is_new_role = target_role not in final_roles
+		if is_new_role:
+			final_roles.append(target_role)
 
-		try:
-			# Add the new or current highest role
-			if target_role not in member.roles:
-				await member.add_roles(target_role)
+		# Single PATCH request instead of separate add_roles/remove_roles calls
+		if is_new_role or len(final_roles) != len(current_roles):
+			try:
+				await member.edit(roles=final_roles, reason=f"Guess win #{wins_count}")
+			except discord.Forbidden:
+				log.error("Permission Error: Cannot add/remove role for %s. Check bot permissions and role hierarchy.", member.display_name)
+				return
+			except discord.HTTPException as e:
+				log.error("Error during role edit for %s: %s", member.display_name, e)
+				return
+
+		# Only tell the user about the role once the edit has actually gone through
+		if is_new_role:
+			try:
 				await member.send(f"You've reached {wins_count} wins and earned the role **{target_role.name}**!")
-			
-			# Remove redundant lower-tier roles
-			if roles_to_remove:
-				await member.remove_roles(*roles_to_remove)
-				
-		except discord.Forbidden:
-			print(f"Permission Error: Cannot add/remove role for {member.display_name}. Check bot permissions and role hierarchy.")
-		except Exception as e:
-			print(f"Error managing role: {e}")
+			except discord.Forbidden:
+				log.warning("Cannot send a DM to %s (DMs are closed).", member.display_name)
+			except discord.HTTPException as e:
+				log.error("Error during DM for %s: %s", member.display_name, e)
 
 
 # --- Admin Commands ---
@@ -366,25 +633,25 @@ async def award_winner_roles(member: discord.Member):
 @bot.command(name='setitem', help='[ADMIN] Sets the correct item name for the game.')
 @is_authorized_admin()
 async def set_item_name(ctx, *, item_name: str):
-	global correct_answer, is_game_active
+	global correct_answer, correct_answer_lower, is_game_active
 	
 	if is_game_active:
 		await ctx.send("Cannot change the item while a game is running.")
 		return
 
-	correct_answer = item_name.strip()
+	# Collapse runs of whitespace so guesses only need the same single spacing
+	correct_answer = " ".join(item_name.split())
+	correct_answer_lower = correct_answer.casefold()
 	save_game_state() # Save state after setting item
 	await ctx.send(f"✅ Correct item set to: **{correct_answer}**.")
-	await bot.change_presence(activity=discord.Game(name=f"Waiting for hints (!sethint or !setallhints)"))
+	set_presence("Waiting for hints (!sethint or !setallhints)")
 
 
-@bot.command(name='sethint', help=f"[ADMIN] Sets hints 1 through {CONFIG['REQUIRED_HINTS']}. Usage: !sethint 1 This is the first hint...")
+@bot.command(name='sethint', help=f"[ADMIN] Sets hints 1 through {REQUIRED_HINTS}. Usage: !sethint 1 This is the first hint...")
 @is_authorized_admin()
 async def set_hint(ctx, number: int, *, hint_text: str):
 	global is_game_active, current_hints_storage
 
-	REQUIRED_HINTS = CONFIG['REQUIRED_HINTS']
-
 	if is_game_active:
 		await ctx.send("Cannot modify hints while a game is running.")
 		return
@@ -402,18 +669,16 @@ async def set_hint(ctx, number: int, *, hint_text: str):
 		save_game_state() # Save state when fully configured
 		await ctx.send(f"✅ Hint No. **{number}/{REQUIRED_HINTS}** has been set. **All {REQUIRED_HINTS} hints are now configured!**")
 		if correct_answer:
-			await bot.change_presence(activity=discord.Game(name=f"Ready! (!start)"))
+			set_presence("Ready! (!start)")
 	else:
 		await ctx.send(f"✅ Hint No. **{number}/{REQUIRED_HINTS}** has been set. Currently configured hints: **{current_count}/{REQUIRED_HINTS}**.")
 
 
-@bot.command(name='setallhints', help=f'[ADMIN] Sets all {CONFIG["REQUIRED_HINTS"]} hints at once, separated by new lines.')
+@bot.command(name='setallhints', help=f'[ADMIN] Sets all {REQUIRED_HINTS} hints at once, separated by new lines.')
 @is_authorized_admin()
 async def set_all_hints(ctx, *, hints_text: str):
 	global is_game_active, current_hints_storage
 
-	REQUIRED_HINTS = CONFIG['REQUIRED_HINTS']
-
 	if is_game_active:
 		await ctx.send("Cannot modify hints while a game is running.")
 		return
@@ -440,7 +705,7 @@ async def set_all_hints(ctx, *, hints_text: str):
 		f"✅ Successfully set **all {REQUIRED_HINTS} hints** at once! The game is ready to start."
 	)
 	if correct_answer:
-		await bot.change_presence(activity=discord.Game(name=f"Ready! (!start)"))
+		set_presence("Ready! (!start)")
 
 
 @bot.command(name='sethinttiming', help='[ADMIN] Sets the interval for revealing hints (in minutes).')
@@ -465,40 +730,38 @@ async def set_hint_timing(ctx, minutes: int):
 @bot.command(name='revealhint', help='[ADMIN] Immediately reveals the next sequential hint.')
 @is_authorized_admin()
 async def reveal_hint_manual(ctx):
-	global current_hints_revealed, last_hint_reveal_time, current_hints_storage
-
-	REQUIRED_HINTS = CONFIG['REQUIRED_HINTS']
+	global current_hints_revealed_count, last_hint_reveal_time, current_hints_storage
 
 	if not is_game_active:
 		return await ctx.send("❌ Cannot reveal a hint: No game is currently active.")
 	
-	next_hint_number = len(current_hints_revealed) + 1
+	next_hint_number = current_hints_revealed_count + 1
 
 	if next_hint_number > REQUIRED_HINTS:
 		return await ctx.send(f"❌ All **{REQUIRED_HINTS}** hints have already been revealed.")
 
 	if next_hint_number in current_hints_storage:
-		channel = bot.get_channel(CONFIG['HINT_CHANNEL_ID'])
+		channel = hint_channel
 		
 		if channel:
 			hint_text = current_hints_storage[next_hint_number]
-			ping_string = generate_hint_ping_string()
 			
 			ping_message = (
-				f"{ping_string}📢 **Manual Hint Reveal ({next_hint_number}/{REQUIRED_HINTS}):** "
+				f"{HINT_PING_STRING}📢 **Manual Hint Reveal ({next_hint_number}/{REQUIRED_HINTS}):** "
 				f"_{hint_text}_"
 			)
 
 			await channel.send(ping_message)
 			
 			# Update game state
-			current_hints_revealed.append({'hint_number': next_hint_number, 'text': hint_text}) 
+			current_hints_revealed_count = next_hint_number
 			last_hint_reveal_time = datetime.now() # Reset the timer after a manual reveal
 			save_game_state()
+			schedule_hints() # Re-arm the scheduler for the new reveal time
 			
 			await ctx.send(f"✅ Hint **{next_hint_number}** has been manually revealed in {channel.mention}. The timer has been reset.")
 		else:
-			await ctx.send(f"❌ Error: Hint channel ID {CONFIG['HINT_CHANNEL_ID']} not found. Please check configuration.")
+			await ctx.send(f"❌ Error: Hint channel ID {HINT_CHANNEL_ID} not found. Please check configuration.")
 	else:
 		await ctx.send(f"❌ Hint **{next_hint_number}** is not configured. Please ensure you have set all {REQUIRED_HINTS} hints.")
 
@@ -506,31 +769,40 @@ async def reveal_hint_manual(ctx):
 @bot.command(name='stop', help='[ADMIN] Forcefully ends the current game and resets ALL game settings.')
 @is_authorized_admin()
 async def stop_game(ctx):
-	global is_game_active, correct_answer, current_hints_revealed, current_hints_storage, last_hint_reveal_time
+	global is_game_active, correct_answer, correct_answer_lower, current_hints_revealed_count, current_hints_storage, last_hint_reveal_time
 
 	# Perform the full reset regardless of the current state of is_game_active
 	is_game_active = False
 	correct_answer = None
-	current_hints_revealed = []
+	correct_answer_lower = None
+	current_hints_revealed_count = 0
 	current_hints_storage = {}
 	last_hint_reveal_time = None
 	
-	if hint_timer.is_running():
-		hint_timer.stop()
+	cancel_hints()
 
-	save_game_state() # Save cleared state
+	await flush_game_state_async() # Save cleared state immediately
 		
 	await ctx.send("🚨 **Game State Forcefully Reset.** All item and hint settings have been cleared. The bot is ready to set up a new game using `!setitem`.")
-	await bot.change_presence(activity=discord.Game(name=f"Setting up the game (!setitem)"))
-
+	set_presence("Setting up the game (!setitem)")
+
+
+# Static parts of the !status embed; only the description and field values change per call
+STATUS_EMBED_TEMPLATE = {
+	'title': "🎮 Current Game Status",
+	'color': discord.Color.blue().value,
+	'fields': [
+		{'name': "Correct Answer", 'inline': False},
+		{'name': "Hint Configuration", 'inline': True},
+		{'name': "Hint Timer", 'inline': True}
+	]
+}
 
 @bot.command(name='status', help='[ADMIN] Displays the current game status and configuration.')
 @is_authorized_admin()
 async def game_status(ctx):
 	"""Displays the current game state for admin diagnosis."""
-	global is_game_active, correct_answer, hint_timing_minutes, current_hints_storage, last_hint_reveal_time, current_hints_revealed
-
-	REQUIRED_HINTS = CONFIG['REQUIRED_HINTS']
+	global is_game_active, correct_answer, hint_timing_minutes, current_hints_storage, last_hint_reveal_time, current_hints_revealed_count
 	
 	# Game Status Check
 	status_emoji = "🟢 ACTIVE" if is_game_active else "🔴 INACTIVE"
@@ -543,7 +815,7 @@ async def game_status(ctx):
 	hint_status = f"✅ All {REQUIRED_HINTS} hints configured." if configured_hints == REQUIRED_HINTS else f"⚠️ {configured_hints}/{REQUIRED_HINTS} hints configured."
 
 	# Revealed Hints Status
-	revealed_count = len(current_hints_revealed)
+	revealed_count = current_hints_revealed_count
 	revealed_text = f"{revealed_count} / {configured_hints} Revealed."
 	
 	# Next Hint Time
@@ -560,24 +832,14 @@ async def game_status(ctx):
 			next_hint_time_str_detail = f"Expected at: {next_reveal.strftime('%H:%M:%S UTC')}" 
 		else:
 			next_hint_time_str = "⏳ Due now"
-			next_hint_time_str_detail = "Waiting for next minute loop."
+			next_hint_time_str_detail = "Waiting for the hint scheduler."
 
-	# Construct the Embed
-	embed = discord.Embed(
-		title="🎮 Current Game Status",
-		description=f"Status: **{status_emoji}**",
-		color=discord.Color.blue()
-	)
-	
-	embed.add_field(name="Correct Answer", value=answer_status, inline=False)
-	
 	# Hint Details
 	hint_details = (
 		f"**Required:** {REQUIRED_HINTS}\n"
 		f"**Configured:** {hint_status}\n"
 		f"**Interval:** {hint_timing_minutes} minutes"
 	)
-	embed.add_field(name="Hint Configuration", value=hint_details, inline=True)
 	
 	# Timer Details (only if a game is/was active)
 	timer_details = (
@@ -586,7 +848,14 @@ async def game_status(ctx):
 		f"**Next Reveal:** {next_hint_time_str}\n"
 		f"{next_hint_time_str_detail if is_game_active and last_hint_reveal_time else ''}"
 	)
-	embed.add_field(name="Hint Timer", value=timer_details, inline=True)
+
+	# Fill the dynamic parts of the pre-built template (field order matches STATUS_EMBED_TEMPLATE)
+	field_values = (answer_status, hint_details, timer_details)
+	embed = discord.Embed.from_dict({
+		**STATUS_EMBED_TEMPLATE,
+		'description': f"Status: **{status_emoji}**",
+		'fields': [dict(field, value=value) for field, value in zip(STATUS_EMBED_TEMPLATE['fields'], field_values)]
+	})
 
 	await ctx.send(embed=embed)
 
@@ -596,12 +865,14 @@ async def game_status(ctx):
 async def test_ping(ctx):
 	"""Admin command to test role ping functionality immediately, including checks for role existence and hierarchy."""
 	
-	is_target_channel = ctx.channel.id == CONFIG['HINT_CHANNEL_ID']
-	ping_string = generate_hint_ping_string()
+	is_target_channel = ctx.channel.id == HINT_CHANNEL_ID
+	ping_string = HINT_PING_STRING
 	
 	# Detailed check for each configured role
 	check_results = []
 	all_roles_found = True
+	# The bot's own member object, resolved once for all role checks
+	bot_member = ctx.guild.me
 	
 	for role_id in CONFIG['HINT_PING_ROLE_IDS']:
 		role = ctx.guild.get_role(role_id)
@@ -611,8 +882,6 @@ async def test_ping(ctx):
 			role_name = role.name
 			
 			# Check 2: Hierarchy (Bot's highest role must be above the target role)
-			# Find the bot's highest role
-			bot_member = ctx.guild.get_member(bot.user.id)
 			if not bot_member:
 				hierarchy_status = "⚠️ Bot member not found in guild. Cannot check hierarchy."
 			else:
@@ -659,7 +928,7 @@ async def test_ping(ctx):
 	if not is_target_channel:
 		channel_warning = (
 			f"⚠️ **Warning:** This test is not running in the configured hint channel ID "
-			f"(`{CONFIG['HINT_CHANNEL_ID']}`). "
+			f"(`{HINT_CHANNEL_ID}`). "
 			f"The final ping will occur in the correct channel when the hint is due."
 		)
 
@@ -681,10 +950,7 @@ async def test_ping(ctx):
 @bot.command(name='start', help='[ADMIN] Starts a new game with the configured item.')
 @is_authorized_admin()
 async def start_game(ctx):
-	global correct_answer, is_game_active, current_hints_revealed, last_hint_reveal_time
-	
-	REQUIRED_HINTS = CONFIG['REQUIRED_HINTS']
-	COOLDOWN_MINUTES = CONFIG['GUESS_COOLDOWN_MINUTES']
+	global correct_answer, is_game_active, current_hints_revealed_count, last_hint_reveal_time
 
 	if is_game_active:
 		await ctx.send("A game is already running! Try guessing with `!guess <item>`.")
@@ -694,38 +960,31 @@ async def start_game(ctx):
 		await ctx.send(f"❌ The administrator must first set the item and all {REQUIRED_HINTS} hints using `!setitem` and `!sethint <1-{REQUIRED_HINTS}> ...` or `!setallhints`")
 		return
 
-	is_game_active = True
-	current_hints_revealed = []
-	
-	first_hint_text = current_hints_storage[1]
-	last_hint_reveal_time = datetime.now()
-	
-	# CRITICAL FIX: Ensure the timer is running when starting a new game.
-	if not hint_timer.is_running():
-		hint_timer.start()
-		print("Hint timer restarted via !start command.")
-
 	# Go to the dedicated channel for hints
-	announcement_channel = bot.get_channel(CONFIG['HINT_CHANNEL_ID'])
+	announcement_channel = hint_channel
 
 	if not announcement_channel:
-		is_game_active = False # Cancel game start
+		# Checked before touching any game state, so there is nothing to roll back or save
 		await ctx.send("❌ Error: The automatic hint channel was not found. Please ask an admin to check the configuration ID.")
-		save_game_state() # Save inactive state
 		return
 
+	is_game_active = True
+	first_hint_text = current_hints_storage[1]
+	last_hint_reveal_time = datetime.now()
+
 	# Store the first revealed hint and save state
-	current_hints_revealed.append({'hint_number': 1, 'text': first_hint_text})
+	current_hints_revealed_count = 1
 	save_game_state() 
 
-	print(f"New game started, item is {correct_answer}")
-	await bot.change_presence(activity=discord.Game(name=f"Guess the item! (!guess)"))
-	
-	# Generate ping string and construct the message for the first hint
-	ping_string = generate_hint_ping_string()
+	# CRITICAL FIX: Ensure the next hints are scheduled when starting a new game.
+	schedule_hints()
 
+	log.info("New game started, item is %s", correct_answer)
+	set_presence("Guess the item! (!guess)")
+	
+	# Construct the message for the first hint with the precomputed ping string
 	start_message = (
-		f'{ping_string}📢 **A new item guessing game has started!** Hints will be revealed every **{hint_timing_minutes} minutes**.'
+		f'{HINT_PING_STRING}📢 **A new item guessing game has started!** Hints will be revealed every **{hint_timing_minutes} minutes**.'
 		f'\n\n**First Hint (1/{REQUIRED_HINTS}):** _{first_hint_text}_'
 		f'\n\nStart guessing with `!guess <item name>`! (Remember the one guess per {COOLDOWN_MINUTES} minute cooldown.)' # Updated cooldown time
 	)
@@ -737,101 +996,100 @@ async def start_game(ctx):
 	await ctx.send(f"✅ The game has started! The first hint has been sent to {announcement_channel.mention}.")
 
 
-@bot.command(name='guess', help='Attempts to guess the item name.')
+# cooldown_after_parsing: a bare or malformed !guess fails before the bucket is consumed, so only real guesses count
+@bot.command(name='guess', help='Attempts to guess the item name.', cooldown_after_parsing=True)
+# One guess per user per cooldown window; the bucket is consumed before the command body runs
+@commands.cooldown(1, COOLDOWN_SECONDS, commands.BucketType.user)
 async def guess_item(ctx, *, guess: str):
-	global correct_answer, is_game_active
+	global correct_answer, correct_answer_lower, is_game_active, current_hints_revealed_count, current_hints_storage
 
 	if not is_game_active:
+		guess_item.reset_cooldown(ctx) # Not a real guess, don't start the cooldown
 		await ctx.send("No active game. Start a new one with `!start`.")
 		return
 	
 	# Check if the command is used in the leaderboard channel (should be caught by global check, but included for robustness)
-	if ctx.channel.id == CONFIG['WINS_CHANNEL_ID']:
+	if ctx.channel.id == WINS_CHANNEL_ID:
+		guess_item.reset_cooldown(ctx)
 		await ctx.send("❌ Guessing (`!guess`) is not allowed in this channel. Please use the main game category.", delete_after=10)
 		return
 
-	user_id = ctx.author.id
-	now = datetime.now()
-	cooldown_minutes = CONFIG['GUESS_COOLDOWN_MINUTES']
-	
-	# Check cooldown
-	if user_id in last_guess_time:
-		time_since_last_guess = now - last_guess_time[user_id]
-		if time_since_last_guess < timedelta(minutes=cooldown_minutes):
-			remaining_time = timedelta(minutes=cooldown_minutes) - time_since_last_guess
-			seconds = int(remaining_time.total_seconds())
-			time_remaining_str = format_time_remaining(seconds)
-			
-			# Use ctx.reply for better visibility
-			await ctx.reply(f"🛑 **Cooldown Active:** You must wait **{time_remaining_str}** before guessing again.", delete_after=5)
-			return
-
-	# Record the new guess time *before* checking accuracy
-	last_guess_time[user_id] = now
-	
 	# Check the guess (case-insensitive)
 	if not correct_answer:
 		# Failsafe for corruption: If the game is active but no answer is set
 		await ctx.send("❌ Internal Error: The game is active, but the correct answer is missing. Please ask an admin to run `!stop` to reset the game.")
 		return
 
-	# Check the guess (case-insensitive)
-	if guess.strip().lower() == correct_answer.lower():
-		# 1. Announce in the current channel
-		await ctx.send(f"🎉 **Congratulations, {ctx.author.display_name}!** You guessed the item: **{correct_answer}**! The game is over!")
-
-		# 2. Announce in the dedicated winner channel
-		announcement_channel = bot.get_channel(CONFIG['WINNER_ANNOUNCEMENT_CHANNEL_ID'])
-		if announcement_channel:
-			winner_ping = ctx.author.mention
-			message = f"🏆 **ROUND WINNER!** {winner_ping} just guessed the item. The correct answer was: **{correct_answer}**!"
-			await announcement_channel.send(message)
+	# Check the guess (case-insensitive; casefold also matches Unicode case variants)
+	if " ".join(guess.split()).casefold() == correct_answer_lower:
+		answer = correct_answer
 		
-		if hint_timer.is_running():
-			hint_timer.stop()
-			
-		await award_winner_roles(ctx.author)
-
-		# Reset game variables
+		# Reset game variables before any await, so a second correct guess arriving meanwhile can't win too
 		is_game_active = False
 		correct_answer = None # Clear item for next round
-		current_hints_revealed = []
+		correct_answer_lower = None
+		current_hints_revealed_count = 0
 		current_hints_storage = {}
+		cancel_hints()
+		set_presence("Setting up the game (!setitem)")
 		
-		save_game_state() # Save cleared state after a win
+		# 1. Announce in the current channel, with the game end ping in the same message (for admins to set up the next game)
+		announcements = [ctx.send(
+			f"🎉 **Congratulations, {ctx.author.display_name}!** You guessed the item: **{answer}**! The game is over!\n"
+			f"{GAME_END_PING_STRING} ✅ The game has ended and an admin can set up the next round using `!setitem`."
+		)]
+
+		# 2. Announce in the dedicated winner channel
+		announcement_channel = winner_channel
+		if announcement_channel:
+			winner_ping = ctx.author.mention
+			message = f"🏆 **ROUND WINNER!** {winner_ping} just guessed the item. The correct answer was: **{answer}**!"
+			announcements.append(announcement_channel.send(message))
 		
-		# Ping the game end role (for admins to set up the next game)
-		game_end_ping_string = generate_game_end_ping_string()
-		await ctx.send(f"{game_end_ping_string} ✅ The game has ended and an admin can set up the next round using `!setitem`.")
+		# 3. Award roles and save the cleared state immediately after a win
+		# None of these depend on each other, so they run concurrently instead of one round-trip at a time
+		await asyncio.gather(*announcements, award_winner_roles(ctx.author), flush_game_state_async())
 
 	else:
-		# Show cooldown time in the message (cooldown_minutes is the duration they must wait from now)
-		cooldown_display = format_time_remaining(CONFIG['GUESS_COOLDOWN_MINUTES'] * 60)
+		# Show cooldown time in the message (COOLDOWN_SECONDS is the duration they must wait from now)
+		cooldown_display = format_time_remaining(COOLDOWN_SECONDS)
 		await ctx.send(f"❌ Wrong! **{ctx.author.display_name}**, that's not it. You can guess again in {cooldown_display}.")
 
 
+@guess_item.error
+async def guess_item_error(ctx, error):
+	"""Replies with the remaining time during a cooldown, or with usage help for a missing/invalid guess."""
+	if isinstance(error, commands.CommandOnCooldown):
+		time_remaining_str = format_time_remaining(int(error.retry_after))
+		# Use ctx.reply for better visibility
+		await ctx.reply(f"🛑 **Cooldown Active:** You must wait **{time_remaining_str}** before guessing again.", delete_after=5)
+	elif isinstance(error, commands.UserInputError):
+		await ctx.reply("❌ Usage: `!guess <item name>`", delete_after=10)
+	else:
+		# A local error handler suppresses the default traceback output, so log other errors (with traceback) here
+		log.error("Error in !guess: %s", error, exc_info=error)
+
+
 @bot.command(name='current', help='Displays the hints revealed so far.')
 async def show_current_hints(ctx):
 	"""Displays the hints revealed so far, or the game status if no hints are out."""
-	global is_game_active, current_hints_revealed
+	global is_game_active, current_hints_revealed_count
 
 	if not is_game_active:
 		await ctx.send("No game is currently active. Use `!start` to begin a new round.")
 		return
 	
-	if not current_hints_revealed:
+	if not current_hints_revealed_count:
 		await ctx.send("The game has started, but no hints have been revealed yet (waiting for the first hint to be posted).")
 		return
-
-	REQUIRED_HINTS = CONFIG['REQUIRED_HINTS']
 	
 	embed = discord.Embed(
-		title=f"🔎 Current Game Hints ({len(current_hints_revealed)}/{REQUIRED_HINTS})",
+		title=f"🔎 Current Game Hints ({current_hints_revealed_count}/{REQUIRED_HINTS})",
 		color=discord.Color.teal()
 	)
 	
-	for hint in current_hints_revealed:
-		embed.add_field(name=f"Hint {hint['hint_number']}", value=f"_{hint['text']}_", inline=False)
+	for hint_number in range(1, current_hints_revealed_count + 1):
+		embed.add_field(name=f"Hint {hint_number}", value=f"_{current_hints_storage[hint_number]}_", inline=False)
 
 	await ctx.send(embed=embed)
 
@@ -839,13 +1097,13 @@ async def show_current_hints(ctx):
 @bot.command(name='nexthint', help='Shows the time remaining until the next hint is revealed.')
 async def show_next_hint_time(ctx):
 	"""Shows the time remaining until the next hint is revealed."""
-	global is_game_active, last_hint_reveal_time, hint_timing_minutes, current_hints_revealed, current_hints_storage
+	global is_game_active, last_hint_reveal_time, hint_timing_minutes, current_hints_revealed_count, current_hints_storage
 
 	if not is_game_active:
 		return await ctx.send("The guessing game is currently inactive. Use `!start` to begin a new round.")
 
 	# Check if all hints have been revealed (and the timer should be stopped)
-	if len(current_hints_revealed) == CONFIG['REQUIRED_HINTS'] or len(current_hints_revealed) == len(current_hints_storage):
+	if current_hints_revealed_count == REQUIRED_HINTS or current_hints_revealed_count == len(current_hints_storage):
 		return await ctx.send("All hints have already been revealed for the current item! Time to guess!")
 	
 	if not last_hint_reveal_time:
@@ -857,14 +1115,14 @@ async def show_next_hint_time(ctx):
 	seconds = int(time_until_next.total_seconds())
 	
 	if seconds <= 0:
-		# Time has passed, but the hint_timer loop hasn't run yet.
-		await ctx.send("⏳ The next hint is due now and will be revealed momentarily (waiting for the minute-long timer loop to execute).")
+		# Time has passed, but the hint scheduler hasn't posted the hint yet.
+		await ctx.send("⏳ The next hint is due now and will be revealed momentarily.")
 	else:
 		time_remaining_str = format_time_remaining(seconds)
-		next_hint_number = len(current_hints_revealed) + 1
+		next_hint_number = current_hints_revealed_count + 1
 		
 		await ctx.send(
-			f"⏱️ **Next Hint ({next_hint_number}/{CONFIG['REQUIRED_HINTS']})** will be revealed in **{time_remaining_str}** "
+			f"⏱️ **Next Hint ({next_hint_number}/{REQUIRED_HINTS})** will be revealed in **{time_remaining_str}** "
 			f"(at approximately {next_reveal.strftime('%H:%M UTC')})."
 		)
 
@@ -876,21 +1134,16 @@ async def show_my_wins(ctx):
 	wins = user_wins.get(ctx.author.id, 0)
 	
 	# Determine the current rank role achieved
-	WINNER_ROLES_CONFIG = CONFIG['WINNER_ROLES_CONFIG']
 	achieved_role_name = "None"
 	
-	sorted_wins_levels = sorted(WINNER_ROLES_CONFIG.keys(), reverse=True)
-	
-	for level in sorted_wins_levels:
-		if wins >= level:
-			# Get the actual discord role object for the name
-			role_id = WINNER_ROLES_CONFIG[level]
-			role = ctx.guild.get_role(role_id)
-			if role:
-				achieved_role_name = role.name
-			else:
-				achieved_role_name = f"Role Not Found (ID: {role_id})"
-			break
+	role_id = get_tier_role_id(wins)
+	if role_id:
+		# Get the actual discord role object for the name
+		role = ctx.guild.get_role(role_id)
+		if role:
+			achieved_role_name = role.name
+		else:
+			achieved_role_name = f"Role Not Found (ID: {role_id})"
 
 	embed = discord.Embed(
 		title=f"🥇 {ctx.author.display_name}'s Win Count",
@@ -903,48 +1156,54 @@ async def show_my_wins(ctx):
 	await ctx.send(embed=embed)
 
 
-@bot.command(name='wins', aliases=['lbc', 'top'], help='Displays the top 10 winners.')
+@bot.command(name='wins', aliases=['lbc', 'top'], help=f'Displays the top {LEADERBOARD_SIZE} winners.')
 async def show_leaderboard(ctx):
-	"""Displays the top 10 users based on their recorded wins."""
-	global user_wins
+	"""Displays the top LEADERBOARD_SIZE users based on their recorded wins."""
+	global user_wins, leaderboard_embed_cache
+	
+	# Identical output between wins: skip the query and name lookups entirely
+	if leaderboard_embed_cache is not None:
+		await ctx.send(embed=leaderboard_embed_cache)
+		return
 	
-	# 1. Sort users by wins in descending order
+	# 1. Get the top users by wins in descending order (cached between wins)
 	# Format: [(user_id, wins_count), ...]
-	sorted_wins = sorted(user_wins.items(), key=lambda item: item[1], reverse=True)
+	top_wins = get_leaderboard_top()
 	
-	if not sorted_wins:
+	if not top_wins:
 		await ctx.send("The leaderboard is currently empty. Be the first to win!")
 		return
 		
-	# 2. Prepare the leaderboard display
-	leaderboard_entries = []
-	rank = 0
-	
-	for user_id, wins in sorted_wins:
-		if rank >= 10: # Only show the top 10
-			break
-			
-		rank += 1
-		
-		# Attempt to fetch the user's name
+	# 2. Resolve display names: cached guild members first, then fetch the rest concurrently
+	names = {}
+	missing_ids = []
+	for user_id, _ in top_wins:
 		member = ctx.guild.get_member(user_id)
 		if member:
-			name = member.display_name
+			names[user_id] = member.display_name
 		else:
-			# If the user is no longer in the server, use their ID or try fetching from bot cache
-			try:
-				user = await bot.fetch_user(user_id)
-				name = user.name # Use username if member is not found
-			except discord.NotFound:
-				name = f"Unknown User ({user_id})"
-			except Exception:
-				name = f"Unknown User ({user_id})"
-				
-		leaderboard_entries.append(f"**#{rank}** - **{name}**: {wins} wins")
+			missing_ids.append(user_id)
+	
+	if missing_ids:
+		# If the user is no longer in the server, fetch their username (one round-trip for all of them)
+		fetched = await asyncio.gather(*(bot.fetch_user(user_id) for user_id in missing_ids), return_exceptions=True)
+		for user_id, user in zip(missing_ids, fetched):
+			if isinstance(user, discord.HTTPException): # Includes discord.NotFound
+				names[user_id] = f"Unknown User ({user_id})"
+			elif isinstance(user, BaseException):
+				raise user
+			else:
+				names[user_id] = user.name # Use username if member is not found
+	
+	# 3. Prepare the leaderboard display
+	leaderboard_entries = [
+		f"**#{rank}** - **{names[user_id]}**: {wins} wins"
+		for rank, (user_id, wins) in enumerate(top_wins, 1)
+	]
 		
-	# 3. Create the Embed
+	# 4. Create the Embed
 	embed = discord.Embed(
-		title="🏆 Item Guessing Leaderboard - Top 10",
+		title=f"🏆 Item Guessing Leaderboard - Top {LEADERBOARD_SIZE}",
 		description="The server's best item guessers!",
 		color=discord.Color.orange()
 	)
@@ -952,42 +1211,71 @@ async def show_leaderboard(ctx):
 	embed.add_field(name="Ranks", value='\n'.join(leaderboard_entries), inline=False)
 	embed.set_footer(text="Use !mywins to check your personal count!")
 	
+	# Only cache if no win invalidated the ranking while names were being fetched
+	if leaderboard_top_cache is top_wins:
+		leaderboard_embed_cache = embed
+	
 	await ctx.send(embed=embed)
 
 # --- STARTUP LOGIC ---
 
+async def start_discord_bot():
+	"""Starts the keep-alive server, then logs in and runs the bot with a pooled connector."""
+	# Open the port first: this fixes the Render "No open ports detected" issue.
+	log.info("Starting keep-alive server on port %s...", WEB_PORT)
+	try:
+		health_runner = await start_health_server()
+	except OSError as e:
+		log.critical("FATAL ERROR: Could not start keep-alive server: %s", e)
+		sys.exit(1)
+	
+	try:
+		# The connector must be created inside the running loop and set before login creates the HTTP session.
+		# AsyncResolver (aiodns) avoids blocking getaddrinfo calls during API bursts.
+		bot.http.connector = aiohttp.TCPConnector(limit=50, ttl_dns_cache=600, resolver=aiohttp.AsyncResolver())
+		# Render stops the service with SIGTERM, which skips atexit: close the bot so the state is flushed below
+		try:
+			asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, lambda: asyncio.create_task(bot.close()))
+		except NotImplementedError:
+			pass # Signal handlers are not supported by the event loop on Windows
+		async with bot:
+			await bot.start(DISCORD_TOKEN)
+	finally:
+		# Persist changes made since the last state_flusher run before the process exits
+		if game_state_dirty:
+			await flush_game_state_async()
+		await health_runner.cleanup()
+
 def run_discord_bot():
-	"""Runs the Discord bot on a separate thread."""
-	global DISCORD_TOKEN
+	"""Runs the Discord bot and the keep-alive server on one event loop (blocking call)."""
 	try:
-		bot.run(DISCORD_TOKEN)
+		asyncio.run(start_discord_bot())
 	except discord.HTTPException as e:
 		if e.status == 429:
-			print("Rate Limit error. The bot is sending too many requests. Please check logs.")
+			log.error("Rate Limit error. The bot is sending too many requests. Please check logs.")
 		else:
-			print(f"An unexpected Discord HTTP error occurred: {e}", file=sys.stderr)
-	except Exception as e:
-		print(f"An error occurred during bot execution: {e}", file=sys.stderr)
+			log.error("An unexpected Discord HTTP error occurred: %s", e)
+	except Exception:
+		log.exception("An error occurred during bot execution")
 
 
 # Get the bot token from environment variables
 DISCORD_TOKEN = os.getenv('DISCORD_TOKEN')
 
-# Check if the token is available
-if not DISCORD_TOKEN:
-    print("FATAL ERROR: DISCORD_TOKEN environment variable is not set.", file=sys.stderr)
-    sys.exit(1)
-
-# Start the Discord bot on a background thread
-print("Starting Discord bot on background thread...")
-bot_thread = threading.Thread(target=run_discord_bot, daemon=True)
-bot_thread.start()
-
-# Run the Flask server on the main thread (this is the blocking call)
-# This fixes the Render "No open ports detected" issue.
-print(f"Starting Flask server on main thread on port {WEB_PORT}...")
-try:
-	app.run(host='0.0.0.0', port=WEB_PORT, debug=False)
-except Exception as e:
-	print(f"FATAL ERROR: Could not start Flask server on main thread: {e}", file=sys.stderr)
-	sys.exit(1)
+def main():
+	"""Single startup path: only runs when executed as a script, never on import."""
+	# Check if the token is available
+	if not DISCORD_TOKEN:
+		log.critical("FATAL ERROR: DISCORD_TOKEN environment variable is not set.")
+		sys.exit(1)
+
+	# Persist batched game state changes on interpreter shutdown
+	atexit.register(flush_pending_game_state)
+
+	# Run the Discord bot and keep-alive server on the main thread
+	log.info("Starting Discord bot...")
+	run_discord_bot()
+
+
+if __name__ == '__main__':
+	main()